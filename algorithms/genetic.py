@@ -4,11 +4,10 @@ Genetic Algorithm for breakout room assignment.
 
 import random
 import copy
-from utils import (
-    is_valid_solution,
-    calculate_happiness,
-    calculate_stress_for_room
-)
+from collections import OrderedDict
+import numpy as np
+from numba import njit, prange
+from utils import is_valid_solution, build_matrices, renumber_rooms, BUDGET_TOLERANCE
 
 
 def genetic_algorithm(graph, stress_budget, population_size=50, generations=200, mutation_rate=0.1,
@@ -17,233 +16,290 @@ def genetic_algorithm(graph, stress_budget, population_size=50, generations=200,
     nodes = list(graph.nodes)
     num_students = len(nodes)
 
-    population = initialize_population(graph, stress_budget, num_students, population_size)
+    # Extract edge weights once so the hot paths never touch NetworkX
+    H, S = build_matrices(graph)
 
-    best_individual = None
-    best_fitness = float('-inf')
-
-    for generation in range(generations):
-        fitness_scores = [evaluate_fitness(ind, graph, stress_budget) for ind in population]
-
-        # Track best solution found so far
-        for i, fitness in enumerate(fitness_scores):
-            if fitness > best_fitness:
-                best_fitness = fitness
-                best_individual = population[i].copy()
-
-        new_population = []
-
-        # Elitism: preserve best individuals
-        sorted_pop = sorted(zip(fitness_scores, population), key=lambda x: x[0], reverse=True)
-        for i in range(min(elite_count, len(sorted_pop))):
-            new_population.append(sorted_pop[i][1].copy())
+    # Seed the numpy generator and the compiled mutate()'s generator from ours, so runs stay
+    # reproducible under random.seed
+    rng = np.random.default_rng(random.randrange(2 ** 32))
+    seed_mutation(random.randrange(2 ** 31))
 
-        # Generate offspring through selection, crossover, and mutation
-        while len(new_population) < population_size:
-            parent1 = tournament_select(population, fitness_scores, tournament_size)
-            parent2 = tournament_select(population, fitness_scores, tournament_size)
+    # Population is stored as one (population_size, num_students) array, one chromosome per row.
+    # Room count and fitness travel with each row; NaN marks fitness that still needs scoring.
+    population = initialize_population(H, S, stress_budget, num_students, population_size, rng)
+    room_counts = population.max(axis=1) + 1
+    fitness_scores = np.full(population_size, np.nan)
 
-            child1, child2 = crossover(parent1, parent2, num_students)
+    # Preallocated buffers: the next generation is bred into the spare arrays, which are then swapped in
+    next_population = np.empty_like(population)
+    next_room_counts = np.empty_like(room_counts)
+    next_fitness_scores = np.empty_like(fitness_scores)
 
-            if random.random() < mutation_rate:
-                child1 = mutate(child1, num_students)
-            if random.random() < mutation_rate:
-                child2 = mutate(child2, num_students)
+    # Fitness of recently seen chromosomes, keyed by their bytes; duplicates are common after crossover
+    fitness_cache = OrderedDict()
+    fitness_cache_size = 4 * population_size
 
-            child1 = repair_chromosome(child1, graph, stress_budget)
-            child2 = repair_chromosome(child2, graph, stress_budget)
+    best_individual = np.empty(num_students, dtype=np.int32)
+    best_num_rooms = None
+    best_fitness = float('-inf')
 
-            new_population.append(child1)
-            if len(new_population) < population_size:
-                new_population.append(child2)
+    # The final generation is scored like the others but not bred
+    for generation in range(generations + 1):
+        score_population_cached(population, room_counts, fitness_scores, H, S, stress_budget,
+                                fitness_cache, fitness_cache_size)
 
-        population = new_population
+        # Rank once: the top individual updates the best solution so far, the top few become elites
+        order = np.argsort(-fitness_scores, kind='stable')
+        if fitness_scores[order[0]] > best_fitness:
+            best_fitness = fitness_scores[order[0]]
+            best_individual[:] = population[order[0]]
+            best_num_rooms = int(room_counts[order[0]])
 
-    fitness_scores = [evaluate_fitness(ind, graph, stress_budget) for ind in population]
-    for i, fitness in enumerate(fitness_scores):
-        if fitness > best_fitness:
-            best_fitness = fitness
-            best_individual = population[i].copy()
+        if generation == generations:
+            break
 
-    assignment = chromosome_to_dict(best_individual)
-    num_rooms = len(set(best_individual))
+        next_fitness_scores.fill(np.nan)
+
+        # Elitism: preserve best individuals, which carry their fitness over unchanged
+        elites = order[:elite_count]
+        num_elites = len(elites)
+        next_population[:num_elites] = population[elites]
+        next_room_counts[:num_elites] = room_counts[elites]
+        next_fitness_scores[:num_elites] = fitness_scores[elites]
+
+        # Select parents for the whole generation in one batch of tournaments
+        num_pairs = (population_size - num_elites + 1) // 2
+        parents = tournament_select(fitness_scores, tournament_size, 2 * num_pairs, rng)
+
+        # Generate offspring through crossover and mutation
+        slot = num_elites
+        for parent1, parent2 in parents.reshape(-1, 2):
+            for child in crossover(population[parent1], population[parent2], num_students, rng):
+                if slot == population_size:
+                    break
+                if random.random() < mutation_rate:
+                    child = mutate(child, num_students)
+                child, next_room_counts[slot] = repair_chromosome(child, S, stress_budget)
+                next_population[slot] = child
+                slot += 1
+
+        population, next_population = next_population, population
+        room_counts, next_room_counts = next_room_counts, room_counts
+        fitness_scores, next_fitness_scores = next_fitness_scores, fitness_scores
+
+    assignment = best_individual
+    num_rooms = best_num_rooms
+    # A valid chromosome's fitness is its happiness
+    happiness = float(best_fitness)
 
     if not is_valid_solution(assignment, graph, stress_budget, num_rooms):
-        assignment = {i: i for i in range(num_students)}
+        assignment = np.arange(num_students, dtype=np.int32)
         num_rooms = num_students
+        happiness = 0.0
 
-    return assignment, num_rooms
+    return assignment, num_rooms, happiness
 
 
-def initialize_population(graph, stress_budget, num_students, population_size):
+def initialize_population(H, S, stress_budget, num_students, population_size, rng):
     """Create diverse initial population with identity, greedy, and random solutions"""
-    population = []
+    population = np.empty((population_size, num_students), dtype=np.int32)
 
     # Identity solution: each student in their own room
-    population.append([i for i in range(num_students)])
+    population[0] = np.arange(num_students)
 
-    # Greedy solutions provide good starting points
-    for _ in range(population_size // 4):
-        chromosome = create_greedy_chromosome(graph, stress_budget, num_students)
-        population.append(chromosome)
+    # Greedy solutions provide good starting points (construction is deterministic, so build it once)
+    num_greedy = population_size // 4
+    if num_greedy > 0:
+        population[1:1 + num_greedy] = create_greedy_chromosome(H, S, stress_budget, num_students)
 
-    # Random solutions for diversity
-    while len(population) < population_size:
-        num_rooms = random.randint(1, num_students)
-        chromosome = [random.randint(0, num_rooms - 1) for _ in range(num_students)]
-        population.append(chromosome)
+    # Random solutions for diversity, each with its own random room count, drawn in one batch
+    num_random = population_size - 1 - num_greedy
+    max_rooms = rng.integers(1, num_students + 1, size=num_random)
+    population[1 + num_greedy:] = rng.integers(0, max_rooms[:, None], size=(num_random, num_students))
+    for chromosome in population[1 + num_greedy:]:
+        renumber_rooms(chromosome)
 
     return population
 
 
-def create_greedy_chromosome(graph, stress_budget, num_students):
+def create_greedy_chromosome(H, S, stress_budget, num_students):
     """Create chromosome using greedy room merging based on happiness gain"""
     # Start with each student in their own room
-    chromosome = list(range(num_students))
-
-    def get_room_stress(chromosome, room):
-        students = [i for i, room_id in enumerate(chromosome) if room_id == room]
-        if len(students) <= 1:
-            return 0
-        return calculate_stress_for_room(students, graph)
+    chromosome = np.arange(num_students, dtype=np.int32)
+    num_rooms = num_students
+    active_rooms = np.ones(num_students, dtype=bool)
+    room_stress = np.zeros(num_students)
 
-    active_rooms = set(range(num_students))
+    # Room-to-room happiness and stress totals, folded together as rooms merge (diagonal unused)
+    cross_happiness = H.copy()
+    cross_stress = S.copy()
 
     # Try merging rooms greedily
-    for _ in range(num_students - 1):
-        if len(active_rooms) <= 1:
+    while num_rooms > 1:
+        # Check which merges respect the stress constraint for one fewer room
+        budget_per_room = stress_budget / (num_rooms - 1) + BUDGET_TOLERANCE
+        merged_stress = room_stress[:, None] + room_stress[None, :] + cross_stress
+        candidates = np.triu(active_rooms[:, None] & active_rooms[None, :], 1)
+        feasible = candidates & (merged_stress <= budget_per_room)
+        if not feasible.any():
             break
 
-        best_merge = None
-        best_benefit = float('-inf')
+        # Take the feasible merge with the largest happiness gain (first pair wins ties)
+        best_merge = np.argmax(np.where(feasible, cross_happiness, -np.inf))
+        room_a, room_b = np.unravel_index(best_merge, feasible.shape)
 
-        rooms_list = list(active_rooms)
-        for i, room_a in enumerate(rooms_list):
-            students_a = [j for j, room_id in enumerate(chromosome) if room_id == room_a]
+        chromosome[chromosome == room_b] = room_a
+        room_stress[room_a] = merged_stress[room_a, room_b]
+        for cross in (cross_happiness, cross_stress):
+            cross[room_a, :] += cross[room_b, :]
+            cross[:, room_a] += cross[:, room_b]
+        active_rooms[room_b] = False
+        num_rooms -= 1
 
-            for room_b in rooms_list[i + 1:]:
-                students_b = [j for j, room_id in enumerate(chromosome) if room_id == room_b]
+    renumber_rooms(chromosome)
+    return chromosome
 
-                merged = students_a + students_b
-                merged_stress = calculate_stress_for_room(merged, graph)
 
-                # Check if merge respects stress constraint
-                potential_rooms = len(active_rooms) - 1
-                if potential_rooms > 0:
-                    budget_per_room = stress_budget / potential_rooms
-                    if merged_stress <= budget_per_room:
-                        # Calculate happiness gain from merging
-                        happiness_gain = 0
-                        for student_a in students_a:
-                            for student_b in students_b:
-                                happiness_gain += graph.edges[student_a, student_b]['happiness']
+def score_population_cached(population, room_counts, fitness_scores, H, S, stress_budget, cache, cache_size):
+    """Score unscored individuals, reusing cached fitness for chromosomes seen recently (LRU)"""
+    unscored = np.flatnonzero(np.isnan(fitness_scores))
+    keys = [population[i].tobytes() for i in unscored]
 
-                        if happiness_gain > best_benefit:
-                            best_benefit = happiness_gain
-                            best_merge = (room_a, room_b)
+    for i, key in zip(unscored, keys):
+        if key in cache:
+            cache.move_to_end(key)
+            fitness_scores[i] = cache[key]
 
-        if best_merge:
-            room_a, room_b = best_merge
-            for i in range(num_students):
-                if chromosome[i] == room_b:
-                    chromosome[i] = room_a
-            active_rooms.remove(room_b)
-        else:
-            break
+    score_population(population, room_counts, fitness_scores, H, S, stress_budget)
 
-    room_mapping = {}
-    next_room = 0
-    for i in range(num_students):
-        if chromosome[i] not in room_mapping:
-            room_mapping[chromosome[i]] = next_room
-            next_room += 1
-        chromosome[i] = room_mapping[chromosome[i]]
+    for i, key in zip(unscored, keys):
+        cache[key] = fitness_scores[i]
+        cache.move_to_end(key)
+    while len(cache) > cache_size:
+        cache.popitem(last=False)
 
-    return chromosome
 
+@njit(cache=True, parallel=True)
+def score_population(population, room_counts, fitness_scores, H, S, stress_budget):
+    """Fill in fitness_scores for individuals not yet scored (NaN entries), rows in parallel"""
+    for i in prange(population.shape[0]):
+        if np.isnan(fitness_scores[i]):
+            fitness_scores[i] = evaluate_fitness(population[i], room_counts[i], H, S, stress_budget)
 
-def evaluate_fitness(chromosome, graph, stress_budget):
-    """Evaluate fitness: happiness for valid solutions, negative penalty for invalid"""
-    assignment = chromosome_to_dict(chromosome)
-    num_rooms = len(set(chromosome))
 
-    if not is_valid_solution(assignment, graph, stress_budget, num_rooms):
+@njit(cache=True)
+def evaluate_fitness(chromosome, num_rooms, H, S, stress_budget):
+    """Evaluate fitness: happiness for valid solutions, negative penalty for invalid"""
+    # A solution is valid exactly when no room exceeds its share of the budget
+    stress_penalty = calculate_stress_violation(chromosome, num_rooms, S, stress_budget)
+    if stress_penalty > 0:
         # Penalize but don't completely reject invalid solutions (allows evolution to fix)
-        stress_penalty = calculate_stress_violation(chromosome, graph, stress_budget)
         return -stress_penalty
 
-    return calculate_happiness(assignment, graph)
+    return calculate_total_happiness(chromosome, H)
 
 
-def calculate_stress_violation(chromosome, graph, stress_budget):
-    num_rooms = len(set(chromosome))
+@njit(cache=True)
+def calculate_total_happiness(chromosome, H):
+    """Sum happiness over every pair of students sharing a room"""
+    num_students = len(chromosome)
+    total_happiness = 0.0
+    for i in range(num_students):
+        for j in range(i + 1, num_students):
+            if chromosome[i] == chromosome[j]:
+                total_happiness += H[i, j]
+    return total_happiness
+
+
+@njit(cache=True)
+def calculate_stress_violation(chromosome, num_rooms, S, stress_budget):
+    """Total stress in excess of the per-room budget, summed over all rooms
+
+    Rooms must be numbered contiguously from 0 to num_rooms - 1.
+    """
     if num_rooms == 0:
-        return float('inf')
+        return np.inf
+
+    num_students = len(chromosome)
+    room_stress = np.zeros(num_rooms)
+    for i in range(num_students):
+        for j in range(i + 1, num_students):
+            if chromosome[i] == chromosome[j]:
+                room_stress[chromosome[i]] += S[i, j]
 
     budget_per_room = stress_budget / num_rooms
-    total_violation = 0
+    total_violation = 0.0
+    for stress in room_stress:
+        if stress > budget_per_room + BUDGET_TOLERANCE:
+            total_violation += stress - budget_per_room
 
-    rooms = {}
-    for i, room in enumerate(chromosome):
-        rooms.setdefault(room, []).append(i)
+    return total_violation
 
-    for students in rooms.values():
-        room_stress = calculate_stress_for_room(students, graph)
-        if room_stress > budget_per_room:
-            total_violation += room_stress - budget_per_room
 
-    return total_violation
+def tournament_select(fitness_scores, tournament_size, num_winners, rng):
+    """Run num_winners independent tournaments at once and return the index of each winner"""
+    population_size = len(fitness_scores)
+    tournament_size = min(tournament_size, population_size)
 
+    # One row per tournament, contestants drawn without replacement
+    contestants = rng.permuted(np.tile(np.arange(population_size), (num_winners, 1)), axis=1)[:, :tournament_size]
+    winners = fitness_scores[contestants].argmax(axis=1)
+    return contestants[np.arange(num_winners), winners]
 
-def tournament_select(population, fitness_scores, tournament_size):
-    indices = random.sample(range(len(population)), min(tournament_size, len(population)))
-    best_idx = max(indices, key=lambda i: fitness_scores[i])
-    return population[best_idx].copy()
 
+def crossover(parent1, parent2, num_students, rng):
+    """Uniform crossover: one random draw per gene decides which parent each child inherits from"""
+    mask = rng.random(num_students) < 0.5
+    child1 = np.where(mask, parent1, parent2)
+    child2 = np.where(mask, parent2, parent1)
+    return child1, child2
 
-def crossover(parent1, parent2, num_students):
-    child1 = []
-    child2 = []
 
-    for i in range(num_students):
-        if random.random() < 0.5:
-            child1.append(parent1[i])
-            child2.append(parent2[i])
-        else:
-            child1.append(parent2[i])
-            child2.append(parent1[i])
+# Mutation operators, dispatched by integer inside the jitted mutate()
+MUTATE_SWAP, MUTATE_MOVE, MUTATE_SPLIT, MUTATE_MERGE = range(4)
 
-    return child1, child2
 
+@njit(cache=True)
+def seed_mutation(seed):
+    """Seed the generator behind np.random in compiled code, which is separate from numpy's own"""
+    np.random.seed(seed)
 
+
+@njit(cache=True)
 def mutate(chromosome, num_students):
     chromosome = chromosome.copy()
-    num_rooms = len(set(chromosome))
+    # Upper bound on room ids; crossover children may leave gaps, repair closes them
+    num_rooms = chromosome.max() + 1
 
-    mutation_type = random.choice(['swap', 'move', 'split', 'merge'])
+    mutation_type = np.random.randint(0, 4)
 
-    if mutation_type == 'swap' and num_students >= 2:
-        i, j = random.sample(range(num_students), 2)
+    if mutation_type == MUTATE_SWAP and num_students >= 2:
+        i = np.random.randint(0, num_students)
+        j = np.random.randint(0, num_students - 1)
+        if j >= i:
+            j += 1
         chromosome[i], chromosome[j] = chromosome[j], chromosome[i]
 
-    elif mutation_type == 'move':
-        i = random.randint(0, num_students - 1)
-        chromosome[i] = random.randint(0, num_rooms - 1)
+    elif mutation_type == MUTATE_MOVE:
+        i = np.random.randint(0, num_students)
+        chromosome[i] = np.random.randint(0, num_rooms)
 
-    elif mutation_type == 'split' and num_rooms > 0:
-        room_to_split = random.randint(0, num_rooms - 1)
-        students_in_room = [i for i, room_id in enumerate(chromosome) if room_id == room_to_split]
+    elif mutation_type == MUTATE_SPLIT and num_rooms > 0:
+        room_to_split = np.random.randint(0, num_rooms)
+        students_in_room = np.nonzero(chromosome == room_to_split)[0]
         if len(students_in_room) > 1:
-            new_room = max(chromosome) + 1
-            num_to_move = random.randint(1, len(students_in_room) - 1)
-            students_to_move = random.sample(students_in_room, num_to_move)
+            new_room = num_rooms
+            num_to_move = np.random.randint(1, len(students_in_room))
+            students_to_move = np.random.permutation(students_in_room)[:num_to_move]
             for student in students_to_move:
                 chromosome[student] = new_room
 
-    elif mutation_type == 'merge' and num_rooms > 1:
-        rooms = list(set(chromosome))
+    elif mutation_type == MUTATE_MERGE:
+        # num_rooms is only an upper bound, so count the rooms actually in use
+        rooms = np.unique(chromosome)
         if len(rooms) >= 2:
-            room_a, room_b = random.sample(rooms, 2)
+            picked = np.random.choice(len(rooms), 2, replace=False)
+            room_a, room_b = rooms[picked[0]], rooms[picked[1]]
             for i in range(num_students):
                 if chromosome[i] == room_b:
                     chromosome[i] = room_a
@@ -251,52 +307,55 @@ def mutate(chromosome, num_students):
     return chromosome
 
 
-def repair_chromosome(chromosome, graph, stress_budget):
-    """Attempt to fix constraint violations by splitting overloaded rooms"""
-    num_students = len(chromosome)
+@njit(cache=True)
+def repair_chromosome(chromosome, S, stress_budget):
+    """
+    Attempt to fix constraint violations by splitting overloaded rooms.
 
-    # Renumber rooms to be contiguous
-    room_mapping = {}
-    next_room = 0
-    for i in range(num_students):
-        if chromosome[i] not in room_mapping:
-            room_mapping[chromosome[i]] = next_room
-            next_room += 1
-        chromosome[i] = room_mapping[chromosome[i]]
-
-    assignment = chromosome_to_dict(chromosome)
-    num_rooms = len(set(chromosome))
+    Returns:
+        tuple: (chromosome, num_rooms) with rooms numbered contiguously
+    """
+    num_rooms = renumber_rooms(chromosome)
+    num_students = len(chromosome)
 
-    if is_valid_solution(assignment, graph, stress_budget, num_rooms):
-        return chromosome
+    # Scratch buffers shared by every attempt; rooms never outnumber students
+    room_stress = np.empty(num_students)
+    room_size = np.empty(num_students, dtype=np.int64)
+    student_stress = np.empty(num_students)
 
     # Try splitting overloaded rooms (up to 10 attempts)
     for attempt in range(10):
-        rooms = {}
-        for i, room in enumerate(chromosome):
-            rooms.setdefault(room, []).append(i)
-
-        num_rooms = len(rooms)
-        budget_per_room = stress_budget / num_rooms if num_rooms > 0 else 0
-
-        fixed = True
-        for room, students in list(rooms.items()):
-            room_stress = calculate_stress_for_room(students, graph)
-            if room_stress > budget_per_room and len(students) > 1:
-                fixed = False
-                # Move highest-stress student to new room
-                max_stress_student = max(students, key=lambda student: sum(
-                    graph.edges[student, other]['stress'] for other in students if other != student
-                ))
-                new_room = max(chromosome) + 1
-                chromosome[max_stress_student] = new_room
+        budget_per_room = stress_budget / num_rooms + BUDGET_TOLERANCE
+
+        room_stress[:num_rooms] = 0.0
+        room_size[:num_rooms] = 0
+        student_stress[:] = 0.0
+        for i in range(num_students):
+            room_size[chromosome[i]] += 1
+            for j in range(i + 1, num_students):
+                if chromosome[i] == chromosome[j]:
+                    room_stress[chromosome[i]] += S[i, j]
+                    student_stress[i] += S[i, j]
+                    student_stress[j] += S[i, j]
+
+        # Move the highest-stress student of the first overloaded room to a new room
+        overloaded_room = -1
+        for room in range(num_rooms):
+            if room_stress[room] > budget_per_room and room_size[room] > 1:
+                overloaded_room = room
                 break
 
-        if fixed:
+        if overloaded_room == -1:
             break
 
-    return chromosome
+        max_stress_student = -1
+        for i in range(num_students):
+            if chromosome[i] == overloaded_room and (
+                    max_stress_student == -1 or student_stress[i] > student_stress[max_stress_student]):
+                max_stress_student = i
 
+        # Rooms stay contiguous, so the next free id is the room count
+        chromosome[max_stress_student] = num_rooms
+        num_rooms += 1
 
-def chromosome_to_dict(chromosome):
-    return {i: room for i, room in enumerate(chromosome)}
+    return chromosome, num_rooms
@@ -4,37 +4,34 @@ Greedy algorithm with local search for breakout room assignment.
 
 import random
 import copy
+import numpy as np
 from utils import (
-    is_valid_solution,
     calculate_happiness,
     calculate_stress_for_room,
-    calculate_happiness_for_room
+    calculate_happiness_for_room,
+    build_matrices,
+    build_sorted_edges,
+    BUDGET_TOLERANCE,
+    GAIN_TOLERANCE,
 )
 
 
 def greedy_local_search(graph, stress_budget, max_local_search_iterations=1000):
     nodes = list(graph.nodes)
     num_students = len(nodes)
+    H, S = build_matrices(graph)
 
-    assignment, num_rooms = greedy_construction(graph, stress_budget, num_students)
-    assignment, num_rooms = local_search(graph, stress_budget, assignment, num_rooms, max_local_search_iterations)
+    assignment, num_rooms = greedy_construction(H, S, stress_budget, num_students)
+    assignment, num_rooms, happiness = local_search(graph, H, S, stress_budget, assignment, num_rooms,
+                                                    max_local_search_iterations)
 
-    return assignment, num_rooms
+    return assignment, num_rooms, happiness
 
 
-def greedy_construction(graph, stress_budget, num_students):
+def greedy_construction(H, S, stress_budget, num_students):
     """Build initial solution by greedily merging rooms"""
-    nodes = list(graph.nodes)
-
     # Sort edges by happiness/stress ratio (prioritize high-value, low-stress pairs)
-    edges = []
-    for i in range(num_students):
-        for j in range(i + 1, num_students):
-            happiness = graph.edges[i, j]['happiness']
-            stress = graph.edges[i, j]['stress']
-            ratio = happiness / stress if stress > 0 else float('inf')
-            edges.append((i, j, happiness, stress, ratio))
-    edges.sort(key=lambda x: x[4], reverse=True)
+    sorted_edges = build_sorted_edges(H, S)
 
     # Start with each student in their own room
     assignment = {i: i for i in range(num_students)}
@@ -49,11 +46,12 @@ def greedy_construction(graph, stress_budget, num_students):
         students_a = rooms[room_a]
         students_b = rooms[room_b]
 
-        # Calculate total stress if rooms are merged
+        # Calculate total stress if rooms are merged: both rooms plus every cross pair. Cross stress
+        # is never negative, so skip summing it when the two rooms alone are already over budget.
         combined_stress = room_stress[room_a] + room_stress[room_b]
-        for student_a in students_a:
-            for student_b in students_b:
-                combined_stress += graph.edges[student_a, student_b]['stress']
+        if combined_stress > budget_per_room:
+            return False
+        combined_stress += S[np.ix_(students_a, students_b)].sum()
 
         if combined_stress <= budget_per_room:
             for student in students_b:
@@ -66,7 +64,7 @@ def greedy_construction(graph, stress_budget, num_students):
         return False
 
     # Try merging rooms in order of highest happiness/stress ratio
-    for student_i, student_j, happiness, stress, ratio in edges:
+    for student_i, student_j in sorted_edges.tolist():
         num_rooms = len(rooms)
         if num_rooms <= 1:
             break
@@ -78,7 +76,8 @@ def greedy_construction(graph, stress_budget, num_students):
         if room_i != room_j:
             # Calculate stress budget assuming merge succeeds
             potential_rooms = num_rooms - 1
-            potential_budget = stress_budget / potential_rooms if potential_rooms > 0 else float('inf')
+            potential_budget = (stress_budget / potential_rooms + BUDGET_TOLERANCE if potential_rooms > 0
+                                else float('inf'))
             merge_rooms(room_i, room_j, potential_budget)
 
     assignment, num_rooms = renumber_rooms(assignment)
@@ -93,110 +92,154 @@ def renumber_rooms(assignment):
     return renumbered, len(room_ids)
 
 
-def local_search(graph, stress_budget, assignment, num_rooms, max_iterations):
+def local_search(graph, H, S, stress_budget, assignment, num_rooms, max_iterations):
     """Iteratively improve solution through local moves"""
-    best_assignment = assignment.copy()
-    best_num_rooms = num_rooms
-    best_happiness = calculate_happiness(assignment, graph)
+    # Only improving moves are kept, so the working assignment is always the best one found.
+    # Candidates are scored by their happiness delta and applied in place once accepted.
+    # Room IDs stay contiguous: moves never empty a room and merges renumber
+    labels = np.array([assignment[student] for student in range(len(assignment))], dtype=np.int32)
+    num_students = len(labels)
+    all_students = np.arange(num_students)
+    best_happiness = calculate_happiness(labels, graph)
+    rebuild = True
+
+    def move_student(student, target_room):
+        """Move student to target_room, updating the room tables for just the columns it touches"""
+        current_room = labels[student]
+        room_stress[current_room] -= stress_to_room[student, current_room]
+        room_stress[target_room] += stress_to_room[student, target_room]
+        happiness_to_room[:, current_room] -= H[:, student]
+        happiness_to_room[:, target_room] += H[:, student]
+        stress_to_room[:, current_room] -= S[:, student]
+        stress_to_room[:, target_room] += S[:, student]
+        room_size[current_room] -= 1
+        room_size[target_room] += 1
+        labels[student] = target_room
 
     for iteration in range(max_iterations):
         improved = False
 
-        # Rebuild room structure
-        rooms = {}
-        for student, room in assignment.items():
-            rooms.setdefault(room, []).append(student)
-        num_rooms = len(rooms)
-        room_ids = list(rooms.keys())
-
-        # Try moving each student to a different room
-        students = list(assignment.keys())
+        # Room tables are built once and then maintained by move_student; only a merge, which
+        # changes the room count, rebuilds them. Column r of happiness_to_room is each student's
+        # happiness with room r (H has a zero diagonal), and likewise for stress_to_room.
+        if rebuild:
+            num_rooms = labels.max() + 1
+            room_ids = list(range(num_rooms))
+            budget_per_room = stress_budget / num_rooms + BUDGET_TOLERANCE
+            onehot = np.zeros((num_students, num_rooms))
+            onehot[all_students, labels] = 1.0
+            happiness_to_room = H @ onehot
+            stress_to_room = S @ onehot
+            room_size = np.bincount(labels, minlength=num_rooms)
+            room_stress = np.bincount(labels, weights=stress_to_room[all_students, labels],
+                                      minlength=num_rooms) / 2
+            rebuild = False
+
+        # Try moving each student to a different room, scoring every transfer at once
+        delta = happiness_to_room - happiness_to_room[all_students, labels][:, None]
+
+        # Leaving a room only lowers its stress, so only the target room can go over budget;
+        # moves that would empty a room are not allowed. Zero-gain moves are held to the same
+        # tolerance as swaps.
+        improving = ((delta > GAIN_TOLERANCE) & (room_stress[None, :] + stress_to_room <= budget_per_room)
+                     & (room_size[labels] > 1)[:, None])
+        improving[all_students, labels] = False
+
+        # First improvement: the first student in shuffled order, moved to their first improving room
+        students = list(range(num_students))
         random.shuffle(students)
-
-        for student in students:
-            current_room = assignment[student]
-            current_room_students = rooms[current_room]
-
-            # Don't empty a room
-            if len(current_room_students) == 1:
-                continue
-
-            for target_room in room_ids:
-                if target_room == current_room:
-                    continue
-
-                new_assignment = assignment.copy()
-                new_assignment[student] = target_room
-
-                if is_valid_solution(new_assignment, graph, stress_budget, num_rooms):
-                    new_happiness = calculate_happiness(new_assignment, graph)
-                    if new_happiness > best_happiness:
-                        best_assignment = new_assignment.copy()
-                        best_happiness = new_happiness
-                        assignment = new_assignment
-                        improved = True
-                        break
-
-            if improved:
-                break
-
-        if improved:
+        movable = np.flatnonzero(improving[students].any(axis=1))
+        if len(movable) > 0:
+            student = students[movable[0]]
+            target_room = np.argmax(improving[student])
+            best_happiness += delta[student, target_room]
+            move_student(student, target_room)
             continue
 
+        # Room membership as CSR arrays, only needed from here on:
+        # room r's members are order[indptr[r]:indptr[r + 1]]
+        order = np.argsort(labels, kind='stable')
+        indptr = np.concatenate(([0], np.cumsum(room_size)))
+        rooms = [order[indptr[room]:indptr[room + 1]] for room in room_ids]
+
         # Try swapping students between rooms
         if len(room_ids) >= 2:
             for _ in range(min(100, num_rooms * num_rooms)):
                 room_a, room_b = random.sample(room_ids, 2)
-                if not rooms[room_a] or not rooms[room_b]:
-                    continue
-
                 student_a = random.choice(rooms[room_a])
                 student_b = random.choice(rooms[room_b])
 
-                new_assignment = assignment.copy()
-                new_assignment[student_a] = room_b
-                new_assignment[student_b] = room_a
+                # Each student leaves their room and joins the other, so only their two rows of H
+                # change the score (H[a, b] and S[a, b] are not shared by either room afterwards)
+                delta = (happiness_to_room[student_a, room_b] - happiness_to_room[student_a, room_a]
+                         + happiness_to_room[student_b, room_a] - happiness_to_room[student_b, room_b]
+                         - 2 * H[student_a, student_b])
+                # Swaps that only trade equal edges come out as float noise around zero; skip them
+                if delta <= GAIN_TOLERANCE:
+                    continue
 
-                if is_valid_solution(new_assignment, graph, stress_budget, num_rooms):
-                    new_happiness = calculate_happiness(new_assignment, graph)
-                    if new_happiness > best_happiness:
-                        best_assignment = new_assignment.copy()
-                        best_happiness = new_happiness
-                        assignment = new_assignment
-                        improved = True
-                        break
+                pair_stress = S[student_a, student_b]
+                new_stress_a = (room_stress[room_a] - stress_to_room[student_a, room_a]
+                                + stress_to_room[student_b, room_a] - pair_stress)
+                new_stress_b = (room_stress[room_b] - stress_to_room[student_b, room_b]
+                                + stress_to_room[student_a, room_b] - pair_stress)
+
+                if new_stress_a <= budget_per_room and new_stress_b <= budget_per_room:
+                    # Applied as two transfers; the second sees the first, which nets out S[a, b]
+                    move_student(student_a, room_b)
+                    move_student(student_b, room_a)
+                    best_happiness += delta
+                    improved = True
+                    break
 
         # Try merging rooms if no other improvements found
         if not improved:
             if num_rooms > 1:
-                merge_improved = try_merge_rooms(graph, stress_budget, assignment, rooms, best_happiness)
+                merge_improved = try_merge_rooms(H, stress_budget, labels, order, indptr,
+                                                 room_totals(S, order, indptr), best_happiness)
                 if merge_improved:
-                    assignment, num_rooms, best_happiness = merge_improved
-                    best_assignment = assignment.copy()
-                    improved = True
+                    labels, best_happiness = merge_improved
+                    rebuild = True
                 else:
                     break  # No improvements possible
             else:
                 break
 
-    return best_assignment, len(set(best_assignment.values()))
-
-
-def try_merge_rooms(graph, stress_budget, assignment, rooms, current_happiness):
-    room_ids = list(rooms.keys())
-
-    for i, room_a in enumerate(room_ids):
-        for room_b in room_ids[i + 1:]:
-            new_assignment = assignment.copy()
-            for student in rooms[room_b]:
-                new_assignment[student] = room_a
-
-            new_num_rooms = len(set(new_assignment.values()))
-
-            if is_valid_solution(new_assignment, graph, stress_budget, new_num_rooms):
-                new_happiness = calculate_happiness(new_assignment, graph)
-                if new_happiness >= current_happiness:
-                    new_assignment, new_num_rooms = renumber_rooms(new_assignment)
-                    return new_assignment, new_num_rooms, new_happiness
-
-    return None
+    return labels, int(labels.max()) + 1, best_happiness
+
+
+def room_totals(M, order, indptr):
+    """
+    Room-to-room totals of pair matrix M for the CSR rooms (order, indptr): entry (a, b) is the
+    cross total between rooms a and b, and the diagonal is twice each room's own total
+    """
+    # Group rows and columns by room, then reduce each contiguous block
+    starts = indptr[:-1]
+    M_grouped = M[np.ix_(order, order)]
+    return np.add.reduceat(np.add.reduceat(M_grouped, starts, axis=0), starts, axis=1)
+
+
+def try_merge_rooms(H, stress_budget, labels, order, indptr, room_stress_totals, current_happiness):
+    """Merge the first pair of rooms (in room order) that stays within budget without losing happiness"""
+    num_rooms = len(indptr) - 1
+    budget_per_room = stress_budget / (num_rooms - 1) + BUDGET_TOLERANCE
+
+    room_happiness_totals = room_totals(H, order, indptr)
+    room_stress = np.diag(room_stress_totals) / 2
+
+    # A merge is valid when the merged room and every untouched room fit the larger per-room budget
+    over_budget = room_stress > budget_per_room
+    others_over = over_budget.sum() - over_budget[:, None] - over_budget[None, :]
+    merged_stress = room_stress[:, None] + room_stress[None, :] + room_stress_totals
+    new_happiness = current_happiness + room_happiness_totals
+    candidates = np.triu((merged_stress <= budget_per_room) & (others_over == 0)
+                         & (new_happiness >= current_happiness), 1)
+    if not candidates.any():
+        return None
+
+    room_a, room_b = np.argwhere(candidates)[0]
+    new_labels = labels.copy()
+    new_labels[labels == room_b] = room_a
+    # Close the gap left by room_b to keep room IDs contiguous
+    new_labels[new_labels > room_b] -= 1
+    return new_labels, new_happiness[room_a, room_b]
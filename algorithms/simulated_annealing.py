@@ -3,56 +3,47 @@ Simulated Annealing algorithm for breakout room assignment.
 """
 
 import math
+import os
 import random as rand
+import multiprocessing
 import copy
+import numpy as np
+from numba import njit
 from utils import (
     is_valid_solution,
-    calculate_happiness,
     calculate_stress_for_room,
+    build_matrices,
+    build_sorted_edges,
+    renumber_rooms,
+    BUDGET_TOLERANCE,
 )
 
 
-def simulated_annealing(graph, stress_budget):
+def simulated_annealing(graph, stress_budget, restarts=1, init='greedy'):
+    """
+    Anneal from an initial solution chosen by init: 'greedy' (ratio-ordered merges, O(N^2) to
+    build), or the O(N) starts 'singleton' (every student alone) and 'random' (about sqrt(N)
+    random rooms, usually over budget; if no valid solution is reached, every student gets
+    their own room). With restarts > 1, that many independently seeded runs are spread over
+    a process pool and the happiest result is kept. Returns the rooms, the room count and the
+    total happiness.
+    """
     nodes = list(graph.nodes)
     num_students = len(nodes)
-
-    def get_room_lists(assignment):
-        """Convert assignment dict to list of room memberships"""
-        rooms = {}
-        for student, room in assignment.items():
-            rooms.setdefault(room, []).append(student)
-        return [rooms[room_id] for room_id in sorted(rooms.keys())]
-
-    def renumber_rooms(assignment):
-        """Renumber rooms to be contiguous starting from 0"""
-        room_map = {}
-        next_room = 0
-        renumbered = {}
-        for student in sorted(assignment.keys()):
-            room = assignment[student]
-            if room not in room_map:
-                room_map[room] = next_room
-                next_room += 1
-            renumbered[student] = room_map[room]
-        return renumbered
-
-    def evaluate_solution(assignment):
-        """Calculate happiness and validity of an assignment"""
-        rooms = get_room_lists(assignment)
-        num_rooms = len(rooms)
-        is_valid = is_valid_solution(assignment, graph, stress_budget, num_rooms)
-        happiness = calculate_happiness(assignment, graph) if is_valid else -1000
-        return happiness, is_valid
-
-    # Start with greedy initialization
-    current_assignment = greedy_init(graph, stress_budget, num_students)
-    room_assignments = get_room_lists(current_assignment)
-
-    best_assignment = current_assignment.copy()
-    best_happiness, _ = evaluate_solution(current_assignment)
-
-    # Cache current solution's happiness to avoid redundant calculations
-    current_happiness = best_happiness
+    H, S = build_matrices(graph)
+
+    if init == 'greedy':
+        initial_assignment = greedy_init(H, S, stress_budget, num_students)
+        labels = np.array([initial_assignment[student] for student in range(num_students)], dtype=np.int32)
+    elif init == 'singleton':
+        labels = np.arange(num_students, dtype=np.int32)
+    elif init == 'random':
+        num_rooms = max(1, math.isqrt(num_students))
+        random_rooms = [rand.randrange(num_rooms) for _ in range(num_students)]
+        # Compact to contiguous room IDs in case some rooms drew no students
+        labels = np.unique(random_rooms, return_inverse=True)[1].astype(np.int32)
+    else:
+        raise ValueError(f"Unknown init: {init}. Choose from: ['greedy', 'singleton', 'random']")
 
     # Geometric cooling schedule parameters
     initial_temp = 75.0
@@ -61,81 +52,195 @@ def simulated_annealing(graph, stress_budget):
     iterations_per_temp = max(3, num_students // 3)
     max_iterations = 1000 * num_students
     reheat_threshold = 200
+    max_reheats = 7
+
+    # The annealing loop runs compiled; seed its generator from ours so runs stay reproducible
+    anneal_args = (H, S, labels, float(stress_budget), initial_temp, min_temp, cooling_rate,
+                   iterations_per_temp, max_iterations, reheat_threshold, max_reheats)
+    seeds = [rand.randrange(2 ** 31) for _ in range(restarts)]
+    if restarts == 1:
+        results = [anneal(*anneal_args, seeds[0])]
+    else:
+        with multiprocessing.Pool(min(restarts, os.cpu_count() or 1)) as pool:
+            results = pool.map(anneal_worker, [anneal_args + (seed,) for seed in seeds])
+    best_labels, best_happiness = max(results, key=lambda result: result[1])
+    num_rooms = int(best_labels.max()) + 1
+
+    # Validity was tracked incrementally during the anneal, so confirm it against the validator.
+    # A random start may also never reach the budget; every student alone always does.
+    if best_happiness == -1000 or not is_valid_solution(best_labels, graph, stress_budget, num_rooms):
+        best_labels = np.arange(num_students, dtype=np.int32)
+        num_rooms = num_students
+        best_happiness = 0.0
+
+    return best_labels, num_rooms, best_happiness
+
+
+def anneal_worker(args):
+    """Pool entry point for one seeded anneal() run (pickled by name, unlike the jitted function)"""
+    return anneal(*args)
+
+
+MOVE_TRANSFER, MOVE_SWAP, MOVE_MERGE, MOVE_SPLIT = range(4)
+
+
+@njit(cache=True)
+def anneal(H, S, labels, stress_budget, initial_temp, min_temp, cooling_rate,
+           iterations_per_temp, max_iterations, reheat_threshold, max_reheats, seed):
+    """
+    Simulated annealing over room labels (contiguous room IDs), starting from labels.
+    The current solution is a single labels array that candidate moves write into directly
+    and undo when rejected. Returns the best labels found and their happiness (-1000 if no
+    valid solution was seen).
+    """
+    np.random.seed(seed)
+    num_students = len(labels)
+    labels = labels.copy()
+    num_rooms = labels.max() + 1
+
+    # Stress of each room by ID, updated in place by every move. Unused IDs hold zero,
+    # so the solution is valid exactly when the largest entry fits the per-room budget.
+    # Happiness is tracked as a running total that moves update by their delta.
+    room_stress = np.zeros(num_students)
+    current_total = 0.0
+    for i in range(num_students):
+        for j in range(i + 1, num_students):
+            if labels[i] == labels[j]:
+                room_stress[labels[i]] += S[i, j]
+                current_total += H[i, j]
+
+    best_labels = labels.copy()
+    best_happiness = (current_total if room_stress.max() <= stress_budget / num_rooms + BUDGET_TOLERANCE
+                      else -1000.0)
+
+    # Score of the current solution (-1000 while it is over budget)
+    current_happiness = best_happiness
+
+    # Scratch buffers: room members, and the students a move relabels with their old rooms for undo
+    members = np.empty(num_students, dtype=np.int32)
+    other_members = np.empty(num_students, dtype=np.int32)
+    moved = np.empty(num_students, dtype=np.int32)
+    moved_from = np.empty(num_students, dtype=np.int32)
 
     temperature = initial_temp
     iteration = 0
     no_improve_count = 0
     reheat_count = 0
-    max_reheats = 7
 
     while temperature > min_temp and iteration < max_iterations and reheat_count < max_reheats:
         for _ in range(iterations_per_temp):
             iteration += 1
-            num_rooms = len(room_assignments)
 
-            # Choose move type probabilistically
-            move_type = rand.choices(
-                ['transfer', 'swap', 'merge', 'split'],
-                weights=[0.5, 0.3, 0.1, 0.1]
-            )[0]
+            # Choose move type probabilistically (weights 0.5 / 0.3 / 0.1 / 0.1)
+            r = np.random.random()
+            if r < 0.5:
+                move_type = MOVE_TRANSFER
+            elif r < 0.8:
+                move_type = MOVE_SWAP
+            elif r < 0.9:
+                move_type = MOVE_MERGE
+            else:
+                move_type = MOVE_SPLIT
 
-            new_assignment = None
-            new_room_lists = None
+            # Every move touches exactly two rooms; their stress is saved for undo
+            num_moved = 0
+            new_num_rooms = num_rooms
+            room_a = room_b = 0
+            happiness_delta = 0.0
 
             # Transfer: Move one student to a different room
-            if move_type == 'transfer' and num_rooms > 1:
-                from_room_idx = rand.randint(0, num_rooms - 1)
-                if len(room_assignments[from_room_idx]) > 1:  # Don't empty a room
-                    student = rand.choice(room_assignments[from_room_idx])
-                    to_room_idx = rand.randint(0, num_rooms - 1)
-                    if to_room_idx != from_room_idx:
-                        new_assignment = current_assignment.copy()
-                        new_assignment[student] = to_room_idx
-                        # No renumbering needed for transfer
-                        new_room_lists = get_room_lists(new_assignment)
+            if move_type == MOVE_TRANSFER and num_rooms > 1:
+                from_room = np.random.randint(0, num_rooms)
+                size = room_members(labels, from_room, members)
+                if size > 1:  # Don't empty a room
+                    student = members[np.random.randint(0, size)]
+                    to_room = np.random.randint(0, num_rooms)
+                    if to_room != from_room:
+                        room_a, room_b = from_room, to_room
+                        saved_a, saved_b = room_stress[room_a], room_stress[room_b]
+                        happiness_delta = (row_sum(H, student, labels, to_room)
+                                           - row_sum(H, student, labels, from_room))
+                        room_stress[from_room] -= row_sum(S, student, labels, from_room)
+                        room_stress[to_room] += row_sum(S, student, labels, to_room)
+                        moved[0], moved_from[0] = student, from_room
+                        num_moved = 1
+                        labels[student] = to_room
 
             # Swap: Exchange students between two rooms
-            elif move_type == 'swap' and num_rooms >= 2:
-                room_a_idx, room_b_idx = rand.sample(range(num_rooms), 2)
-                if room_assignments[room_a_idx] and room_assignments[room_b_idx]:
-                    student_a = rand.choice(room_assignments[room_a_idx])
-                    student_b = rand.choice(room_assignments[room_b_idx])
-                    new_assignment = current_assignment.copy()
-                    new_assignment[student_a] = room_b_idx
-                    new_assignment[student_b] = room_a_idx
-                    # No renumbering needed for swap
-                    new_room_lists = get_room_lists(new_assignment)
+            elif move_type == MOVE_SWAP and num_rooms >= 2:
+                room_a = np.random.randint(0, num_rooms)
+                room_b = np.random.randint(0, num_rooms - 1)
+                if room_b >= room_a:
+                    room_b += 1
+                size_a = room_members(labels, room_a, members)
+                size_b = room_members(labels, room_b, other_members)
+                student_a = members[np.random.randint(0, size_a)]
+                student_b = other_members[np.random.randint(0, size_b)]
+                saved_a, saved_b = room_stress[room_a], room_stress[room_b]
+                # Each student gains the other's old room minus the student they replace;
+                # S[a, b] is not shared by either room after the swap
+                happiness_delta = (row_sum(H, student_a, labels, room_b) - row_sum(H, student_a, labels, room_a)
+                                   + row_sum(H, student_b, labels, room_a) - row_sum(H, student_b, labels, room_b)
+                                   - 2 * H[student_a, student_b])
+                room_stress[room_a] += (row_sum(S, student_b, labels, room_a)
+                                        - row_sum(S, student_a, labels, room_a) - S[student_a, student_b])
+                room_stress[room_b] += (row_sum(S, student_a, labels, room_b)
+                                        - row_sum(S, student_b, labels, room_b) - S[student_a, student_b])
+                moved[0], moved_from[0] = student_a, room_a
+                moved[1], moved_from[1] = student_b, room_b
+                num_moved = 2
+                labels[student_a] = room_b
+                labels[student_b] = room_a
 
             # Merge: Combine two rooms into one
-            elif move_type == 'merge' and num_rooms >= 2:
-                room_a_idx, room_b_idx = rand.sample(range(num_rooms), 2)
-                new_assignment = current_assignment.copy()
-                for student in room_assignments[room_b_idx]:
-                    new_assignment[student] = room_a_idx
-                # Renumber after merge to keep room IDs contiguous
-                new_assignment = renumber_rooms(new_assignment)
-                new_room_lists = get_room_lists(new_assignment)
+            elif move_type == MOVE_MERGE and num_rooms >= 2:
+                room_a = np.random.randint(0, num_rooms)
+                room_b = np.random.randint(0, num_rooms - 1)
+                if room_b >= room_a:
+                    room_b += 1
+                saved_a, saved_b = room_stress[room_a], room_stress[room_b]
+                happiness_delta = cross_sum(H, labels, room_a, room_b)
+                room_stress[room_a] += room_stress[room_b] + cross_sum(S, labels, room_a, room_b)
+                room_stress[room_b] = 0.0
+                num_moved = room_members(labels, room_b, moved)
+                for i in range(num_moved):
+                    moved_from[i] = room_b
+                    labels[moved[i]] = room_a
+                new_num_rooms = num_rooms - 1
 
             # Split: Divide one room into two
-            elif move_type == 'split' and num_rooms < num_students:
-                room_idx = rand.randint(0, num_rooms - 1)
-                room_students = room_assignments[room_idx]
-                if len(room_students) >= 2:
-                    num_to_split = rand.randint(1, len(room_students) - 1)
-                    students_to_move = rand.sample(room_students, num_to_split)
-                    new_assignment = current_assignment.copy()
-                    new_room_id = max(current_assignment.values()) + 1
-                    for student in students_to_move:
-                        new_assignment[student] = new_room_id
-                    # Renumber after split to keep room IDs contiguous
-                    new_assignment = renumber_rooms(new_assignment)
-                    new_room_lists = get_room_lists(new_assignment)
-
-            if new_assignment is None:
+            elif move_type == MOVE_SPLIT and num_rooms < num_students:
+                room_a = np.random.randint(0, num_rooms)
+                size = room_members(labels, room_a, members)
+                if size >= 2:
+                    # Partial shuffle: the first num_to_split members move, the rest stay
+                    num_to_split = np.random.randint(1, size)
+                    for i in range(num_to_split):
+                        j = np.random.randint(i, size)
+                        members[i], members[j] = members[j], members[i]
+                    # Room IDs are contiguous, so the room count is the next free ID
+                    room_b = num_rooms
+                    saved_a, saved_b = room_stress[room_a], room_stress[room_b]
+                    moved_stress = 0.0
+                    for i in range(num_to_split):
+                        for j in range(i + 1, num_to_split):
+                            moved_stress += S[members[i], members[j]]
+                        for j in range(num_to_split, size):
+                            happiness_delta -= H[members[i], members[j]]
+                            room_stress[room_a] -= S[members[i], members[j]]
+                        moved[i], moved_from[i] = members[i], room_a
+                        labels[members[i]] = room_b
+                    room_stress[room_a] -= moved_stress
+                    room_stress[room_b] = moved_stress
+                    num_moved = num_to_split
+                    new_num_rooms = num_rooms + 1
+
+            if num_moved == 0:
                 continue
 
-            new_happiness, new_valid = evaluate_solution(new_assignment)
-            # Use cached current_happiness instead of re-evaluating
+            new_total = current_total + happiness_delta
+            new_valid = room_stress.max() <= stress_budget / new_num_rooms + BUDGET_TOLERANCE
+            new_happiness = new_total if new_valid else -1000.0
             happiness_delta = new_happiness - current_happiness
 
             # Acceptance criterion: always accept improvements, probabilistically accept worse solutions
@@ -143,24 +248,36 @@ def simulated_annealing(graph, stress_budget):
             if happiness_delta > 0:
                 accept_move = True
             elif temperature > 0:
-                try:
-                    acceptance_prob = math.exp(happiness_delta / temperature)
-                    accept_move = rand.random() < acceptance_prob
-                except OverflowError:
-                    accept_move = False
+                # Below exp(-50) the acceptance chance is negligible; skip the draw and the exp
+                scaled_delta = happiness_delta / temperature
+                accept_move = scaled_delta > -50.0 and np.random.random() < math.exp(scaled_delta)
 
             if accept_move:
-                current_assignment = new_assignment
-                room_assignments = new_room_lists
-                current_happiness = new_happiness  # Update cached happiness
+                if new_num_rooms < num_rooms:
+                    # Keep room IDs contiguous by moving the last room into the merged-away ID;
+                    # a split already takes the next free ID. Full renumbering waits until return.
+                    last_room = num_rooms - 1
+                    if room_b != last_room:
+                        for student in range(num_students):
+                            if labels[student] == last_room:
+                                labels[student] = room_b
+                        room_stress[room_b] = room_stress[last_room]
+                        room_stress[last_room] = 0.0
+                num_rooms = new_num_rooms
+                current_total = new_total
+                current_happiness = new_happiness
 
                 if new_valid and new_happiness > best_happiness:
                     best_happiness = new_happiness
-                    best_assignment = current_assignment.copy()
+                    best_labels[:] = labels
                     no_improve_count = 0
                 else:
                     no_improve_count += 1
             else:
+                # Undo the rejected move
+                for i in range(num_moved):
+                    labels[moved[i]] = moved_from[i]
+                room_stress[room_a], room_stress[room_b] = saved_a, saved_b
                 no_improve_count += 1
 
         temperature *= cooling_rate
@@ -171,10 +288,44 @@ def simulated_annealing(graph, stress_budget):
             no_improve_count = 0
             reheat_count += 1
 
-    return best_assignment, len(set(best_assignment.values()))
+    renumber_rooms(best_labels)
+    return best_labels, best_happiness
+
+
+@njit(cache=True)
+def room_members(labels, room, out):
+    """Write the students in room into out; return how many there are"""
+    count = 0
+    for student in range(len(labels)):
+        if labels[student] == room:
+            out[count] = student
+            count += 1
+    return count
+
 
+@njit(cache=True)
+def row_sum(M, student, labels, room):
+    """Sum M[student, j] over the students j in room"""
+    total = 0.0
+    for j in range(len(labels)):
+        if labels[j] == room:
+            total += M[student, j]
+    return total
 
-def greedy_init(graph, stress_budget, num_students):
+
+@njit(cache=True)
+def cross_sum(M, labels, room_a, room_b):
+    """Sum M[i, j] over every student i in room_a and j in room_b"""
+    total = 0.0
+    for i in range(len(labels)):
+        if labels[i] == room_a:
+            for j in range(len(labels)):
+                if labels[j] == room_b:
+                    total += M[i, j]
+    return total
+
+
+def greedy_init(H, S, stress_budget, num_students):
     """Greedy initialization: merge rooms with highest happiness/stress ratio"""
     # Start with each student in their own room
     assignment = {i: i for i in range(num_students)}
@@ -182,16 +333,7 @@ def greedy_init(graph, stress_budget, num_students):
     room_stress = {i: 0.0 for i in range(num_students)}
 
     # Sort edges by happiness/stress ratio
-    edges = []
-    for i in range(num_students):
-        for j in range(i + 1, num_students):
-            happiness = graph.edges[i, j]['happiness']
-            stress = graph.edges[i, j]['stress']
-            ratio = happiness / stress if stress > 0 else float('inf')
-            edges.append((i, j, ratio))
-    edges.sort(key=lambda x: x[2], reverse=True)
-
-    for student_i, student_j, _ in edges:
+    for student_i, student_j in build_sorted_edges(H, S).tolist():
         if len(rooms) <= 1:
             break
 
@@ -200,15 +342,18 @@ def greedy_init(graph, stress_budget, num_students):
         if room_i == room_j:
             continue
 
-        students_in_room_i = rooms[room_i]
-        students_in_room_j = rooms[room_j]
+        potential_rooms = len(rooms) - 1
+        budget_per_room = (stress_budget / potential_rooms + BUDGET_TOLERANCE if potential_rooms > 0
+                           else float('inf'))
+
+        # Cross stress is never negative, so skip summing it when the two rooms alone are over budget
         merged_stress = room_stress[room_i] + room_stress[room_j]
-        for si in students_in_room_i:
-            for sj in students_in_room_j:
-                merged_stress += graph.edges[si, sj]['stress']
+        if merged_stress > budget_per_room:
+            continue
 
-        potential_rooms = len(rooms) - 1
-        budget_per_room = stress_budget / potential_rooms if potential_rooms > 0 else float('inf')
+        students_in_room_i = rooms[room_i]
+        students_in_room_j = rooms[room_j]
+        merged_stress += S[np.ix_(students_in_room_i, students_in_room_j)].sum()
 
         if merged_stress <= budget_per_room:
             for student in students_in_room_j:
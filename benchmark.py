@@ -6,8 +6,10 @@ Comprehensive benchmark: Run all algorithms on all inputs and compare results.
 import os
 import sys
 import time
-import glob
-from collections import defaultdict
+import random
+import itertools
+import multiprocessing
+import numpy as np
 from tabulate import tabulate
 
 import parse
@@ -21,60 +23,106 @@ ALGORITHMS = {
     'genetic': ('Genetic', genetic_algorithm),
 }
 
-
-def run_benchmark(sizes=None, save_outputs=True, max_files=None):
-    """Run all algorithms on all inputs."""
+SIZES = ['small', 'medium', 'large']
+
+# Every pair (i, j), i < j, of algorithms by their index in ALGORITHMS
+MATCHUPS = list(itertools.combinations(range(len(ALGORITHMS)), 2))
+WIN, LOSS, TIE = range(3)
+
+# Per-algorithm, per-size totals kept in the summary table
+HAPPINESS, TIME_NS, VALID, COUNT, WINS = range(5)
+
+
+def run_one(task):
+    """Run one algorithm on one input file; top-level so worker processes can run it."""
+    input_file, alg_key = task
+    try:
+        G, s = parse.read_input_file(input_file)
+    except Exception as e:
+        return {'read_error': str(e)}
+
+    try:
+        start = time.perf_counter_ns()
+        D, k, happiness = ALGORITHMS[alg_key][1](G, s)
+        elapsed_ns = time.perf_counter_ns() - start
+
+        # Algorithms report the happiness they tracked, which may carry float noise from
+        # incremental updates. Inputs have at most 3 decimal places, so rounding recovers the
+        # exact total and equal solutions still tie.
+        assert abs(happiness - calculate_happiness(D, G)) < 1e-6
+        valid = is_valid_solution(D, G, s, k)
+        happiness = round(happiness, 3) if valid else 0
+
+        return {
+            'D': D,
+            'k': k,
+            'happiness': happiness,
+            'valid': valid,
+            'time_ns': elapsed_ns
+        }
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def run_benchmark(sizes=None, save_outputs=True, max_files=None, workers=1):
+    """Run all algorithms on all inputs, spreading (file, algorithm) runs over workers processes."""
     if sizes is None:
-        sizes = ['small', 'medium', 'large']
+        sizes = SIZES
 
     results = []
-    summary = {alg: defaultdict(lambda: {'happiness': 0, 'time': 0, 'valid': 0, 'count': 0, 'wins': 0})
-               for alg in ALGORITHMS}
-
-    for size in sizes:
-        input_dir = f"data/{size}/inputs"
-        if not os.path.exists(input_dir):
-            print(f"Skipping {size}: directory not found")
-            continue
+    # summary[i, s] holds algorithm i's totals on size SIZES[s], indexed by HAPPINESS, TIME_NS, ...
+    # Times are whole nanoseconds, exact in float64 for any realistic run
+    summary = np.zeros((len(ALGORITHMS), len(SIZES), 5))
+    # head_to_head[i, j] counts algorithm i's wins, losses and ties against algorithm j
+    head_to_head = np.zeros((len(ALGORITHMS), len(ALGORITHMS), 3), dtype=np.int32)
+
+    # Runs come back in task order, so each file is reported as soon as its algorithms finish.
+    # Forked workers would all inherit one random state, so each reseeds on startup.
+    pool = multiprocessing.Pool(workers or os.cpu_count(), initializer=random.seed) if workers != 1 else None
+    try:
+        for size in sizes:
+            input_dir = f"data/{size}/inputs"
+            if not os.path.exists(input_dir):
+                print(f"Skipping {size}: directory not found")
+                continue
 
-        input_files = sorted(glob.glob(os.path.join(input_dir, "*.in")))
-        if max_files:
-            input_files = input_files[:max_files]
+            # One directory read gives names and types; no glob
+            input_files = sorted(os.path.join(input_dir, entry.name) for entry in os.scandir(input_dir)
+                                 if entry.name.endswith('.in') and entry.is_file())
+            if max_files:
+                input_files = input_files[:max_files]
 
-        print(f"\n{'='*60}")
-        print(f"Processing {len(input_files)} {size.upper()} inputs")
-        print('='*60)
+            print(f"\n{'='*60}")
+            print(f"Processing {len(input_files)} {size.upper()} inputs")
+            print('='*60)
 
-        for idx, input_file in enumerate(input_files):
-            basename = os.path.basename(input_file)
-            print(f"[{idx+1}/{len(input_files)}] {basename}...", end=" ", flush=True)
+            size_idx = SIZES.index(size)
+            tasks = [(input_file, alg_key) for input_file in input_files for alg_key in ALGORITHMS]
+            outcomes = pool.imap(run_one, tasks) if pool else map(run_one, tasks)
 
-            try:
-                G, s = parse.read_input_file(input_file)
-            except Exception as e:
-                print(f"ERROR reading: {e}")
-                continue
+            for idx, input_file in enumerate(input_files):
+                basename = os.path.basename(input_file)
+                print(f"[{idx+1}/{len(input_files)}] {basename}...", end=" ", flush=True)
 
-            file_results = {}
-            best_happiness = -1
-            best_alg = None
+                file_outcomes = {alg_key: next(outcomes) for alg_key in ALGORITHMS}
+                read_errors = [o['read_error'] for o in file_outcomes.values() if 'read_error' in o]
+                if read_errors:
+                    print(f"ERROR reading: {read_errors[0]}")
+                    continue
 
-            for alg_key, (alg_name, alg_func) in ALGORITHMS.items():
-                try:
-                    start = time.time()
-                    D, k = alg_func(G, s)
-                    elapsed = time.time() - start
+                file_results = {}
+                best_happiness = -1
+                best_alg = None
 
-                    valid = is_valid_solution(D, G, s, k)
-                    happiness = calculate_happiness(D, G) if valid else 0
+                for alg_idx, (alg_key, (alg_name, _)) in enumerate(ALGORITHMS.items()):
+                    outcome = file_outcomes[alg_key]
+                    if 'error' in outcome:
+                        print(f"{alg_name} ERROR: {outcome['error']}", end=" ")
+                        file_results[alg_key] = None
+                        continue
 
-                    file_results[alg_key] = {
-                        'D': D,
-                        'k': k,
-                        'happiness': happiness,
-                        'valid': valid,
-                        'time': elapsed
-                    }
+                    file_results[alg_key] = outcome
+                    happiness, valid, elapsed_ns = outcome['happiness'], outcome['valid'], outcome['time_ns']
 
                     # Track best for this file
                     if valid and happiness > best_happiness:
@@ -82,43 +130,47 @@ def run_benchmark(sizes=None, save_outputs=True, max_files=None):
                         best_alg = alg_key
 
                     # Update summary
-                    summary[alg_key][size]['happiness'] += happiness
-                    summary[alg_key][size]['time'] += elapsed
-                    summary[alg_key][size]['valid'] += 1 if valid else 0
-                    summary[alg_key][size]['count'] += 1
-
-                except Exception as e:
-                    print(f"{alg_name} ERROR: {e}", end=" ")
-                    file_results[alg_key] = None
-
-            # Mark winner
-            if best_alg:
-                summary[best_alg][size]['wins'] += 1
-
-            # Save best output
-            if save_outputs and best_alg and file_results[best_alg]:
-                output_dir = f"data/{size}/outputs"
-                os.makedirs(output_dir, exist_ok=True)
-                output_file = os.path.join(output_dir, basename.replace('.in', '.out'))
-                parse.write_output_file(file_results[best_alg]['D'], output_file)
-
-            # Print comparison for this file
-            result_str = []
-            for alg_key in ALGORITHMS:
-                if file_results.get(alg_key):
-                    r = file_results[alg_key]
-                    marker = "*" if alg_key == best_alg else " "
-                    result_str.append(f"{alg_key}:{r['happiness']:.1f}{marker}")
-            print(" | ".join(result_str))
-
-            results.append({
-                'size': size,
-                'file': basename,
-                'results': file_results,
-                'winner': best_alg
-            })
+                    summary[alg_idx, size_idx] += (happiness, elapsed_ns, valid, 1, 0)
+
+                # Mark winner
+                if best_alg:
+                    summary[list(ALGORITHMS).index(best_alg), size_idx, WINS] += 1
+
+                # Head-to-head record for every pair of algorithms with valid results
+                ranked = [file_results[alg_key] for alg_key in ALGORITHMS]
+                for i, j in MATCHUPS:
+                    if ranked[i] and ranked[j] and ranked[i]['valid'] and ranked[j]['valid']:
+                        diff = ranked[i]['happiness'] - ranked[j]['happiness']
+                        head_to_head[i, j, WIN if diff > 0 else LOSS if diff < 0 else TIE] += 1
+
+                # Save best output
+                if save_outputs and best_alg and file_results[best_alg]:
+                    output_dir = f"data/{size}/outputs"
+                    os.makedirs(output_dir, exist_ok=True)
+                    output_file = os.path.join(output_dir, basename.replace('.in', '.out'))
+                    parse.write_output_file(file_results[best_alg]['D'], output_file)
+
+                # Print comparison for this file
+                result_str = []
+                for alg_key in ALGORITHMS:
+                    if file_results.get(alg_key):
+                        r = file_results[alg_key]
+                        marker = "*" if alg_key == best_alg else " "
+                        result_str.append(f"{alg_key}:{r['happiness']:.1f}{marker}")
+                print(" | ".join(result_str))
+
+                results.append({
+                    'size': size,
+                    'file': basename,
+                    'results': file_results,
+                    'winner': best_alg
+                })
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
 
-    return results, summary
+    return results, summary, head_to_head
 
 
 def print_summary(summary):
@@ -127,19 +179,19 @@ def print_summary(summary):
     print("SUMMARY BY SIZE")
     print("="*80)
 
-    for size in ['small', 'medium', 'large']:
+    for size_idx, size in enumerate(SIZES):
         print(f"\n{size.upper()}:")
         table = []
-        for alg_key, (alg_name, _) in ALGORITHMS.items():
-            s = summary[alg_key][size]
-            if s['count'] > 0:
+        for alg_idx, (alg_name, _) in enumerate(ALGORITHMS.values()):
+            happiness, time_ns, valid, count, wins = summary[alg_idx, size_idx]
+            if count > 0:
                 table.append({
                     'Algorithm': alg_name,
-                    'Avg Happiness': round(s['happiness'] / s['count'], 2),
-                    'Total Happiness': round(s['happiness'], 2),
-                    'Valid': f"{s['valid']}/{s['count']}",
-                    'Wins': s['wins'],
-                    'Avg Time': f"{s['time'] / s['count']:.3f}s"
+                    'Avg Happiness': round(happiness / count, 2),
+                    'Total Happiness': round(happiness, 2),
+                    'Valid': f"{int(valid)}/{int(count)}",
+                    'Wins': int(wins),
+                    'Avg Time': f"{time_ns * 1e-9 / count:.3f}s"
                 })
         if table:
             print(tabulate(table, headers='keys', tablefmt='grid'))
@@ -149,64 +201,41 @@ def print_summary(summary):
     print("OVERALL SUMMARY")
     print("="*80)
     overall = []
-    for alg_key, (alg_name, _) in ALGORITHMS.items():
-        total_happiness = sum(summary[alg_key][sz]['happiness'] for sz in ['small', 'medium', 'large'])
-        total_count = sum(summary[alg_key][sz]['count'] for sz in ['small', 'medium', 'large'])
-        total_valid = sum(summary[alg_key][sz]['valid'] for sz in ['small', 'medium', 'large'])
-        total_wins = sum(summary[alg_key][sz]['wins'] for sz in ['small', 'medium', 'large'])
-        total_time = sum(summary[alg_key][sz]['time'] for sz in ['small', 'medium', 'large'])
+    for alg_idx, (alg_name, _) in enumerate(ALGORITHMS.values()):
+        total_happiness, total_time_ns, total_valid, total_count, total_wins = summary[alg_idx].sum(axis=0)
 
         if total_count > 0:
             overall.append({
                 'Algorithm': alg_name,
                 'Avg Happiness': round(total_happiness / total_count, 2),
                 'Total Happiness': round(total_happiness, 2),
-                'Valid': f"{total_valid}/{total_count}",
-                'Wins': total_wins,
+                'Valid': f"{int(total_valid)}/{int(total_count)}",
+                'Wins': int(total_wins),
                 'Win Rate': f"{100*total_wins/total_count:.1f}%",
-                'Total Time': f"{total_time:.1f}s"
+                'Total Time': f"{total_time_ns * 1e-9:.1f}s"
             })
 
     print(tabulate(overall, headers='keys', tablefmt='grid'))
 
 
-def print_head_to_head(results):
+def print_head_to_head(head_to_head):
     """Print head-to-head comparison."""
     print("\n" + "="*80)
     print("HEAD-TO-HEAD COMPARISON")
     print("="*80)
 
-    comparisons = defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0})
-
-    for r in results:
-        if not r['results']:
-            continue
-
-        algs = list(ALGORITHMS.keys())
-        for i, alg_a in enumerate(algs):
-            for alg_b in algs[i+1:]:
-                res_a = r['results'].get(alg_a)
-                res_b = r['results'].get(alg_b)
-
-                if res_a and res_b and res_a['valid'] and res_b['valid']:
-                    key = f"{alg_a} vs {alg_b}"
-                    if res_a['happiness'] > res_b['happiness']:
-                        comparisons[key]['wins'] += 1
-                    elif res_a['happiness'] < res_b['happiness']:
-                        comparisons[key]['losses'] += 1
-                    else:
-                        comparisons[key]['ties'] += 1
-
+    algs = list(ALGORITHMS.keys())
     table = []
-    for matchup, stats in comparisons.items():
-        alg_a, alg_b = matchup.split(' vs ')
-        total = stats['wins'] + stats['losses'] + stats['ties']
+    for i, j in MATCHUPS:
+        wins, losses, ties = head_to_head[i, j].tolist()
+        if wins + losses + ties == 0:
+            continue
         table.append({
-            'Matchup': matchup,
-            f'{alg_a} wins': stats['wins'],
-            f'{alg_b} wins': stats['losses'],
-            'Ties': stats['ties'],
-            'Total': total
+            'Matchup': f"{algs[i]} vs {algs[j]}",
+            f'{algs[i]} wins': wins,
+            f'{algs[j]} wins': losses,
+            'Ties': ties,
+            'Total': wins + losses + ties
         })
 
     print(tabulate(table, headers='keys', tablefmt='grid'))
@@ -215,22 +244,27 @@ def print_head_to_head(results):
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Comprehensive algorithm benchmark')
-    parser.add_argument('--sizes', nargs='+', choices=['small', 'medium', 'large'],
-                        default=['small', 'medium', 'large'], help='Sizes to benchmark')
+    parser.add_argument('--sizes', nargs='+', choices=SIZES,
+                        default=SIZES, help='Sizes to benchmark')
     parser.add_argument('--max-files', type=int, help='Max files per size category')
     parser.add_argument('--no-save', action='store_true', help='Do not save output files')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for (file, algorithm) runs (0 = one per CPU; default 1 '
+                             'keeps per-run times free of contention)')
 
     args = parser.parse_args()
 
     print("Starting comprehensive benchmark...")
     print(f"Sizes: {args.sizes}")
     print(f"Max files per size: {args.max_files or 'all'}")
+    print(f"Workers: {args.workers or os.cpu_count()}")
 
-    results, summary = run_benchmark(
+    results, summary, head_to_head = run_benchmark(
         sizes=args.sizes,
         save_outputs=not args.no_save,
-        max_files=args.max_files
+        max_files=args.max_files,
+        workers=args.workers
     )
 
     print_summary(summary)
-    print_head_to_head(results)
+    print_head_to_head(head_to_head)
@@ -1,18 +1,32 @@
 import re
 import os
+import functools
 
 import networkx as nx
+import numpy as np
 
 import utils
 
 
+# One edge line: two student IDs, then happiness and stress with at most 3 decimal places
+_EDGE_LINE = r"\d+ \d+ (?:\d+\.\d{1,3}|\d+) (?:\d+\.\d{1,3}|\d+)"
+_EDGE_BLOCK_RE = re.compile(rf"{_EDGE_LINE}(?:\n{_EDGE_LINE})*")
+# A stress budget: an integer or at most 3 decimal places
+_NUM_RE = re.compile(r"(^\d+\.\d{1,3}$|^\d+$)")
+# A whole file of nothing but numbers and whitespace
+_FILE_RE = re.compile(r"^[\d\.\s]+$")
+
+# Whether read_input_file keeps parsed inputs in <input>.npy sidecar files across runs
+USE_SIDECAR_CACHE = True
+
+
 def validate_file(path):
     """Validate that file is under 100KB and contains only numbers/spaces"""
     if os.path.getsize(path) > 100000:
         print(f"{path} exceeds 100KB, make sure you're not repeating edges!")
         return False
     with open(path, "r") as file:
-        if not re.match(r"^[\d\.\s]+$", file.read()):
+        if not _FILE_RE.match(file.read()):
             print(f"{path} contains characters that are not numbers and spaces")
             return False
     return True
@@ -20,18 +34,60 @@ def validate_file(path):
 
 def read_input_file(path, max_size=None):
     """
-    Parses and validates an input file.
+    Parses and validates an input file. Parsed files are cached by path, modification time
+    and size, so reading the same unchanged file again only copies the cached graph. Across
+    runs, the validated edges are also kept in a <path>.npy sidecar file, which later runs
+    load instead of parsing the text (unless USE_SIDECAR_CACHE is False).
 
     Args:
         path: Path to input file
         max_size: Maximum number of nodes allowed (optional)
 
     Returns:
-        tuple: (G, stress_budget) where G is a complete, connected networkx.Graph
+        tuple: (G, stress_budget) where G is a complete, connected networkx.Graph whose
+        happiness/stress matrices are already cached (see utils.build_matrices)
 
     Raises:
         AssertionError: If input file is malformed or invalid
     """
+    stat = os.stat(path)
+    G, stress_budget = _read_input_file_cached(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, max_size)
+    # Callers may modify their graph, so each gets its own copy (sharing the read-only matrices)
+    return G.copy(), stress_budget
+
+
+@functools.lru_cache(maxsize=512)
+def _read_input_file_cached(path, mtime_ns, size, max_size):
+    """Uncached body of read_input_file; mtime_ns and size key the cache and check the sidecar"""
+    sidecar_path = path + ".npy"
+    parsed = _load_sidecar(sidecar_path, mtime_ns, size) if USE_SIDECAR_CACHE else None
+    if parsed is None:
+        parsed = _parse_input_file(path)
+        if USE_SIDECAR_CACHE:
+            _save_sidecar(sidecar_path, size, *parsed)
+    num_students, stress_budget, edges = parsed
+
+    # Build graph with happiness and stress edge attributes straight from the edge array;
+    # edges go in first so nodes keep their order of first appearance
+    G = nx.Graph()
+    G.add_edges_from((i, j, {"happiness": happiness, "stress": stress})
+                     for i, j, happiness, stress in zip(edges[:, 0].astype(int).tolist(),
+                                                        edges[:, 1].astype(int).tolist(),
+                                                        edges[:, 2].tolist(), edges[:, 3].tolist()))
+    G.add_nodes_from(range(num_students))
+
+    if max_size is not None:
+        assert len(G) <= max_size
+
+    # Build the happiness/stress matrices once here, straight from the edge array;
+    # utils and the algorithms reuse them (see utils.build_matrices)
+    G.graph["matrices"] = utils.build_matrices_from_edges(num_students, edges)
+
+    return G, stress_budget
+
+
+def _parse_input_file(path):
+    """Parse and validate the text of an input file into (num_students, stress_budget, edges)"""
     with open(path, "r") as file:
         # Read number of students
         num_students = file.readline().strip()
@@ -40,48 +96,73 @@ def read_input_file(path, max_size=None):
 
         # Read stress budget
         stress_budget = file.readline().strip()
-        assert bool(re.match(r"(^\d+\.\d{1,3}$|^\d+$)", stress_budget))
+        assert bool(_NUM_RE.match(stress_budget))
         stress_budget = float(stress_budget)
         assert 0 < stress_budget < 100
 
         lines = file.read().splitlines()
-        file.close()
-
-        # Validate edge format
-        for line in lines:
-            tokens = line.split(" ")
-
-            assert len(tokens) == 4
-            assert tokens[0].isdigit() and int(tokens[0]) < num_students
-            assert tokens[1].isdigit() and int(tokens[1]) < num_students
-            assert bool(re.match(r"(^\d+\.\d{1,3}$|^\d+$)", tokens[2]))
-            assert bool(re.match(r"(^\d+\.\d{1,3}$|^\d+$)", tokens[3]))
-            assert 0 <= float(tokens[2]) < 100
-            assert 0 <= float(tokens[3]) < 100
 
-        # Build graph with happiness and stress edge attributes
-        G = nx.parse_edgelist(lines, nodetype=int, data=(("happiness", float),("stress", float),))
-        G.add_nodes_from(range(num_students))
-
-        # Verify graph is complete and connected
-        assert nx.is_connected(G)
-        assert len(G.edges()) == num_students * (num_students - 1) // 2
-
-        if max_size is not None:
-            assert len(G) <= max_size
-
-        return G, stress_budget
+    # Validate edge format: the whole block in one regex pass, then the value ranges on an
+    # (E, 4) array of student, student, happiness, stress
+    block = "\n".join(lines)
+    assert not lines or _EDGE_BLOCK_RE.fullmatch(block)
+    edges = np.array(block.split(), dtype=np.float64).reshape(-1, 4)
+    assert (edges[:, :2] < num_students).all()
+    assert ((0 <= edges[:, 2:]) & (edges[:, 2:] < 100)).all()
+
+    # Verify graph is complete: every pair of distinct students has an edge. A repeated
+    # pair keeps its last line, as in the graph. A complete graph is connected, so that
+    # needs no separate traversal.
+    u, v = edges[:, 0].astype(np.intp), edges[:, 1].astype(np.intp)
+    assert (u != v).all()
+    seen_pairs = np.zeros((num_students, num_students), dtype=bool)
+    seen_pairs[np.minimum(u, v), np.maximum(u, v)] = True
+    assert seen_pairs.sum() == num_students * (num_students - 1) // 2
+
+    return num_students, stress_budget, edges
+
+
+def _load_sidecar(sidecar_path, mtime_ns, size):
+    """Load a sidecar saved since the input file last changed, or return None"""
+    try:
+        if os.stat(sidecar_path).st_mtime_ns < mtime_ns:
+            return None
+        data = np.load(sidecar_path)
+        num_students, stress_budget, input_size, _ = data[0]
+        if input_size != size:
+            return None
+        return int(num_students), float(stress_budget), data[1:]
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _save_sidecar(sidecar_path, size, num_students, stress_budget, edges):
+    """
+    Save a validated input next to its file as one array: a header row of (num_students,
+    stress_budget, input file size, 0), then the edges. It is written under a temporary name
+    and renamed into place, so concurrent readers never see half a file; failing to save is
+    not an error.
+    """
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp.npy"
+    try:
+        np.save(temp_path, np.vstack(([num_students, stress_budget, size, 0], edges)))
+        os.replace(temp_path, sidecar_path)
+    except OSError:
+        pass
 
 
 def write_input_file(G, stress_budget, path):
     """Write graph and stress budget to input file"""
     with open(path, "w") as file:
         num_students = len(G)
-        lines = nx.generate_edgelist(G, data=["happiness", "stress"])
         file.write(str(num_students) + "\n")
         file.write(str(stress_budget) + "\n")
-        file.writelines("\n".join(lines))
-        file.close()
+        # Stream one edge line at a time through the file buffer; lines are separated, not
+        # terminated, by newlines
+        separator = ""
+        for u, v, data in G.edges(data=True):
+            file.write(f"{separator}{u} {v} {data['happiness']} {data['stress']}")
+            separator = "\n"
 
 
 def read_output_file(path, G, s):
@@ -94,7 +175,7 @@ def read_output_file(path, G, s):
         s: Stress budget
 
     Returns:
-        dict: Mapping of student to room
+        numpy int array holding each student's room
 
     Raises:
         AssertionError: If output file is malformed or invalid
@@ -102,9 +183,8 @@ def read_output_file(path, G, s):
     with open(path, "r") as file:
         students_seen = set()
         rooms_seen = set()
-        D = {}
+        D = np.empty(len(G), dtype=np.int32)
         lines = file.read().splitlines()
-        file.close()
 
         for line in lines:
             tokens = line.split()
@@ -136,9 +216,7 @@ def write_output_file(D, path):
 
     Args:
         path: Path to output file
-        D: Dictionary mapping student to room
+        D: numpy int array holding each student's room
     """
     with open(path, "w") as file:
-        for student, room in D.items():
-            file.write(str(student) + " " + str(room) + "\n")
-        file.close()
\ No newline at end of file
+        file.write("".join(f"{student} {room}\n" for student, room in enumerate(D.tolist())))
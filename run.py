@@ -9,10 +9,11 @@ Usage:
 """
 
 import argparse
+import json
 import os
 import sys
 import time
-import glob
+import numpy as np
 from tabulate import tabulate
 
 import parse
@@ -28,25 +29,25 @@ ALGORITHMS = {
 
 
 def run_algorithm(algorithm_name, G, s):
-    """Run specified algorithm and return results with timing."""
+    """Run specified algorithm and return results with its running time in nanoseconds."""
     if algorithm_name not in ALGORITHMS:
         raise ValueError(f"Unknown algorithm: {algorithm_name}. Choose from: {list(ALGORITHMS.keys())}")
 
     name, func = ALGORITHMS[algorithm_name]
-    start_time = time.time()
-    D, k = func(G, s)
-    elapsed = time.time() - start_time
+    start_time = time.perf_counter_ns()
+    D, k, happiness = func(G, s)
+    elapsed_ns = time.perf_counter_ns() - start_time
 
-    return D, k, elapsed
+    return D, k, happiness, elapsed_ns
 
 
 def process_single_file(input_path, algorithm_name, output_path=None):
     """Process a single input file."""
     G, s = parse.read_input_file(input_path)
-    D, k, elapsed = run_algorithm(algorithm_name, G, s)
+    D, k, happiness, elapsed_ns = run_algorithm(algorithm_name, G, s)
 
     valid = is_valid_solution(D, G, s, k)
-    happiness = calculate_happiness(D, G) if valid else 0
+    happiness = happiness if valid else 0
 
     result = {
         'input': os.path.basename(input_path),
@@ -54,7 +55,7 @@ def process_single_file(input_path, algorithm_name, output_path=None):
         'happiness': round(happiness, 2),
         'rooms': k,
         'valid': 'Yes' if valid else 'No',
-        'time': f"{elapsed:.3f}s"
+        'time': f"{elapsed_ns * 1e-9:.3f}s"
     }
 
     if output_path:
@@ -74,7 +75,8 @@ def benchmark(size, algorithms=None):
         print(f"Error: Directory {input_dir} does not exist")
         return
 
-    input_files = sorted(glob.glob(os.path.join(input_dir, "*.in")))
+    input_files = sorted(os.path.join(input_dir, entry.name) for entry in os.scandir(input_dir)
+                         if entry.name.endswith('.in') and entry.is_file())
     if not input_files:
         print(f"No input files found in {input_dir}")
         return
@@ -82,7 +84,7 @@ def benchmark(size, algorithms=None):
     print(f"Benchmarking {len(input_files)} {size} inputs with {len(algorithms)} algorithms...\n")
 
     results = []
-    totals = {alg: {'happiness': 0, 'time': 0, 'valid': 0, 'count': 0} for alg in algorithms}
+    totals = {alg: {'happiness': 0, 'time_ns': 0, 'valid': 0, 'count': 0} for alg in algorithms}
 
     for input_file in input_files[:10]:  # Limit to 10 files for quick benchmark
         G, s = parse.read_input_file(input_file)
@@ -90,9 +92,9 @@ def benchmark(size, algorithms=None):
 
         for alg in algorithms:
             try:
-                D, k, elapsed = run_algorithm(alg, G, s)
+                D, k, happiness, elapsed_ns = run_algorithm(alg, G, s)
                 valid = is_valid_solution(D, G, s, k)
-                happiness = calculate_happiness(D, G) if valid else 0
+                happiness = happiness if valid else 0
 
                 results.append({
                     'Input': basename,
@@ -100,11 +102,11 @@ def benchmark(size, algorithms=None):
                     'Happiness': round(happiness, 2),
                     'Rooms': k,
                     'Valid': 'Yes' if valid else 'No',
-                    'Time': f"{elapsed:.3f}s"
+                    'Time': f"{elapsed_ns * 1e-9:.3f}s"
                 })
 
                 totals[alg]['happiness'] += happiness
-                totals[alg]['time'] += elapsed
+                totals[alg]['time_ns'] += elapsed_ns
                 totals[alg]['valid'] += 1 if valid else 0
                 totals[alg]['count'] += 1
 
@@ -133,16 +135,29 @@ def benchmark(size, algorithms=None):
                 'Algorithm': ALGORITHMS[alg][0],
                 'Avg Happiness': round(t['happiness'] / t['count'], 2),
                 'Valid Rate': f"{t['valid']}/{t['count']}",
-                'Avg Time': f"{t['time'] / t['count']:.3f}s"
+                'Avg Time': f"{t['time_ns'] * 1e-9 / t['count']:.3f}s"
             })
     print(tabulate(summary, headers='keys', tablefmt='grid'))
 
 
 def validate_outputs(data_dir):
-    """Validate all output files in a data directory."""
+    """
+    Validate all output files in a data directory. Results are cached in
+    data_dir/.validate_cache.json by file paths and modification times, so pairs where neither
+    file changed since the last run are not parsed again.
+    """
     results = []
     sizes = ['small', 'medium', 'large']
 
+    cache_path = os.path.join(data_dir, '.validate_cache.json')
+    try:
+        with open(cache_path) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        cache = {}
+    # Only pairs seen on this run are written back, so stale entries drop out
+    new_cache = {}
+
     for size in sizes:
         input_dir = os.path.join(data_dir, size, 'inputs')
         output_dir = os.path.join(data_dir, size, 'outputs')
@@ -150,11 +165,16 @@ def validate_outputs(data_dir):
         if not os.path.exists(input_dir) or not os.path.exists(output_dir):
             continue
 
-        for input_file in glob.glob(os.path.join(input_dir, "*.in")):
-            basename = os.path.basename(input_file).replace('.in', '.out')
+        # List each directory once; output files are looked up by name instead of a stat apiece
+        outputs = {entry.name: entry for entry in os.scandir(output_dir) if entry.is_file()}
+        inputs = [entry for entry in os.scandir(input_dir) if entry.name.endswith('.in') and entry.is_file()]
+
+        for input_entry in inputs:
+            input_file = input_entry.path
+            basename = input_entry.name.replace('.in', '.out')
             output_file = os.path.join(output_dir, basename)
 
-            if not os.path.exists(output_file):
+            if basename not in outputs:
                 results.append({
                     'Size': size,
                     'File': basename,
@@ -163,10 +183,17 @@ def validate_outputs(data_dir):
                 })
                 continue
 
+            key = (f"{input_file}:{input_entry.stat().st_mtime_ns}:"
+                   f"{output_file}:{outputs[basename].stat().st_mtime_ns}")
+            if key in cache:
+                new_cache[key] = cache[key]
+                results.append({'Size': size, 'File': basename, **cache[key]})
+                continue
+
             try:
                 G, s = parse.read_input_file(input_file)
                 D = parse.read_output_file(output_file, G, s)
-                k = len(set(D.values()))
+                k = len(np.unique(D))
                 valid = is_valid_solution(D, G, s, k)
                 happiness = calculate_happiness(D, G)
 
@@ -183,6 +210,15 @@ def validate_outputs(data_dir):
                     'Valid': f'Error: {str(e)[:30]}',
                     'Happiness': '-'
                 })
+            new_cache[key] = {'Valid': results[-1]['Valid'], 'Happiness': results[-1]['Happiness']}
+
+    # Write to a temporary file and rename it over the cache, so a reader never sees half of it
+    try:
+        with open(cache_path + '.tmp', 'w') as file:
+            json.dump(new_cache, file)
+        os.replace(cache_path + '.tmp', cache_path)
+    except OSError:
+        pass
 
     print(tabulate(results, headers='keys', tablefmt='grid'))
 
@@ -216,9 +252,14 @@ Examples:
     parser.add_argument('--algorithms', help='Comma-separated list of algorithms for benchmark')
     parser.add_argument('--validate', '-v', metavar='DIR',
                         help='Validate all outputs in directory')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse input files from text, without reading or writing .in.npy caches')
 
     args = parser.parse_args()
 
+    if args.no_cache:
+        parse.USE_SIDECAR_CACHE = False
+
     if args.validate:
         validate_outputs(args.validate)
     elif args.benchmark:
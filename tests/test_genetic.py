@@ -0,0 +1,35 @@
+import os
+import random
+import tempfile
+import unittest
+
+import networkx as nx
+
+import parse
+from utils import is_valid_solution
+from algorithms import genetic_algorithm
+
+
+class TestGeneticAlgorithm(unittest.TestCase):
+    def test_tiny_inputs(self):
+        """Rooms can outnumber the students in use after repair; mutation must not crash on that"""
+        with tempfile.TemporaryDirectory() as tmp:
+            for num_students in (2, 3):
+                for seed in range(20):
+                    random.seed(seed)
+                    G = nx.complete_graph(num_students)
+                    for u, v in G.edges:
+                        G[u][v]["happiness"] = round(random.uniform(0, 99), 3)
+                        G[u][v]["stress"] = round(random.uniform(0, 99), 3)
+                    stress_budget = round(random.uniform(1, 99), 3)
+
+                    path = os.path.join(tmp, f"{num_students}-{seed}.in")
+                    parse.write_input_file(G, stress_budget, path)
+                    G, s = parse.read_input_file(path)
+
+                    D, k, _ = genetic_algorithm(G, s)
+                    self.assertTrue(is_valid_solution(D, G, s, k))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,22 @@
 import networkx as nx
+import numpy as np
+from numba import njit
+
+# Room stress sums pick up float rounding that depends on the order they are added in, so a
+# room counts as over budget only when its stress exceeds its share by more than this.
+# Stress values have at most 3 decimal places, so no real excess is ever this small.
+BUDGET_TOLERANCE = 1e-9
+
+# Likewise, a move's happiness gain counts as an improvement only above this; incrementally
+# maintained totals put zero-gain moves at float noise around zero.
+GAIN_TOLERANCE = 1e-9
 
 def is_valid_solution(D, G, s, num_rooms):
     """
     Checks whether D is a valid mapping by verifying each room adheres to the stress budget.
 
     Args:
-        D: Dictionary mapping student to room
+        D: numpy int array holding each student's room
         G: networkx.Graph
         s: Total stress budget
         num_rooms: Number of breakout rooms
@@ -14,15 +25,8 @@ def is_valid_solution(D, G, s, num_rooms):
         bool: whether D is a valid solution
     """
     budget_per_room = s / num_rooms
-    room_to_students = {}
-    for student, room in D.items():
-        room_to_students.setdefault(room, []).append(student)
-
-    for room, students in room_to_students.items():
-        room_stress = calculate_stress_for_room(students, G)
-        if room_stress > budget_per_room:
-            return False
-    return True
+    _, S = build_matrices(G)
+    return _within_budget(S, np.asarray(D, dtype=np.int64), budget_per_room)
 
 
 def calculate_happiness(D, G):
@@ -30,21 +34,19 @@ def calculate_happiness(D, G):
     Calculates the total happiness in mapping D by summing the happiness of each room.
 
     Args:
-        D: Dictionary mapping student to room
+        D: numpy int array holding each student's room
         G: networkx.Graph
 
     Returns:
         float: total happiness
     """
-    room_to_students = {}
-    for student, room in D.items():
-        room_to_students.setdefault(room, []).append(student)
+    H, _ = build_matrices(G)
+    rooms = np.asarray(D, dtype=np.int64)
 
-    total_happiness = 0
-    for room, students in room_to_students.items():
-        room_happiness = calculate_happiness_for_room(students, G)
-        total_happiness += room_happiness
-    return total_happiness
+    # Students grouped by room: room r's members are order[indptr[r]:indptr[r + 1]]
+    order = np.argsort(rooms, kind='stable')
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rooms))))
+    return _rooms_sum(H, order, indptr)
 
 def convert_dictionary(room_to_students):
     """
@@ -76,8 +78,8 @@ def calculate_stress_for_room(students, G):
     Returns:
         float: Total stress for the room
     """
-    subgraph = G.subgraph(students)
-    return subgraph.size("stress")
+    _, S = build_matrices(G)
+    return _room_sum(S, np.asarray(students, dtype=np.int64))
 
 
 def calculate_happiness_for_room(students, G):
@@ -91,5 +93,126 @@ def calculate_happiness_for_room(students, G):
     Returns:
         float: Total happiness for the room
     """
-    subgraph = G.subgraph(students)
-    return subgraph.size("happiness")
+    H, _ = build_matrices(G)
+    return _room_sum(H, np.asarray(students, dtype=np.int64))
+
+
+# Compiled eagerly for the one signature used, so no call ever pays the compile
+@njit("float64(float64[:, :], int64[:])", cache=True)
+def _room_sum(M, students):
+    """Sum M over every pair of distinct students"""
+    total = 0.0
+    for i in range(len(students)):
+        for j in range(i + 1, len(students)):
+            total += M[students[i], students[j]]
+    return total
+
+
+@njit("float64(float64[:, :], int64[:], int64[:])", cache=True)
+def _rooms_sum(M, order, indptr):
+    """Sum M over every pair of students sharing a room, for the grouped rooms (order, indptr)"""
+    total = 0.0
+    for room in range(len(indptr) - 1):
+        total += _room_sum(M, order[indptr[room]:indptr[room + 1]])
+    return total
+
+
+@njit("boolean(float64[:, :], int64[:], float64)", cache=True)
+def _within_budget(S, rooms, budget_per_room):
+    """
+    Whether every room's stress fits the budget, from one pass over all pairs of students.
+    Stress is never negative, so the first room whose running total goes over decides it.
+    """
+    room_stress = np.zeros(rooms.max() + 1)
+    for i in range(len(rooms)):
+        for j in range(i + 1, len(rooms)):
+            if rooms[i] == rooms[j]:
+                room_stress[rooms[i]] += S[i, j]
+                if room_stress[rooms[i]] > budget_per_room + BUDGET_TOLERANCE:
+                    return False
+    return True
+
+
+@njit(cache=True)
+def renumber_rooms(labels):
+    """
+    Renumbers rooms in place to be contiguous, in order of first appearance.
+
+    Args:
+        labels: numpy int array holding each student's room
+
+    Returns:
+        int: number of rooms
+    """
+    room_mapping = np.full(labels.max() + 1, -1, dtype=np.int32)
+    num_rooms = 0
+    for student in range(len(labels)):
+        room = labels[student]
+        if room_mapping[room] == -1:
+            room_mapping[room] = num_rooms
+            num_rooms += 1
+        labels[student] = room_mapping[room]
+    return num_rooms
+
+
+def build_matrices(G):
+    """
+    Builds dense happiness and stress adjacency matrices from the edge attributes of G.
+    The matrices are cached in G.graph, so every later call for the same graph is free;
+    they must be treated as read-only.
+
+    Args:
+        G: networkx.Graph with happiness and stress edge attributes
+
+    Returns:
+        tuple: (H, S) symmetric numpy arrays where H[i, j] and S[i, j] are the pair's values
+    """
+    if "matrices" not in G.graph:
+        num_students = len(G)
+        H = np.zeros((num_students, num_students))
+        S = np.zeros((num_students, num_students))
+        for i, j, data in G.edges(data=True):
+            H[i, j] = H[j, i] = data['happiness']
+            S[i, j] = S[j, i] = data['stress']
+        G.graph["matrices"] = (H, S)
+    return G.graph["matrices"]
+
+
+def build_matrices_from_edges(num_students, edges):
+    """
+    Builds the same matrices as build_matrices from an edge array instead of a graph.
+
+    Args:
+        num_students: Number of students
+        edges: numpy array of shape (E, 4) with rows (student, student, happiness, stress)
+
+    Returns:
+        tuple: (H, S) symmetric numpy arrays where H[i, j] and S[i, j] are the pair's values
+    """
+    i = edges[:, 0].astype(np.intp)
+    j = edges[:, 1].astype(np.intp)
+    H = np.zeros((num_students, num_students))
+    S = np.zeros((num_students, num_students))
+    H[i, j] = H[j, i] = edges[:, 2]
+    S[i, j] = S[j, i] = edges[:, 3]
+    return H, S
+
+
+def build_sorted_edges(H, S):
+    """
+    Orders every pair of students by happiness/stress ratio, highest first. Pairs with no
+    stress rank first; ties keep (i, j) order.
+
+    Args:
+        H: Happiness matrix from build_matrices
+        S: Stress matrix from build_matrices
+
+    Returns:
+        numpy array of shape (M, 2) holding the (i, j) student pairs, i < j, in ratio order
+    """
+    pairs_i, pairs_j = np.triu_indices(len(H), 1)
+    stress = S[pairs_i, pairs_j]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(stress > 0, H[pairs_i, pairs_j] / stress, np.inf)
+    order = np.argsort(-ratios, kind='stable')
+    return np.stack([pairs_i[order], pairs_j[order]], axis=1).astype(np.int32)